@@ -0,0 +1,77 @@
+"""
+Configuração do Gunicorn para produção
+
+Uso (a partir de api/app):
+    gunicorn -c gunicorn.conf.py main:app
+
+Sinais:
+    SIGHUP       - relê esta configuração e recria os workers a partir do master;
+                   com preload_app o código já importado é reaproveitado, então
+                   NÃO carrega código novo
+    SIGUSR2 + SIGQUIT no master antigo - troca de versão sem derrubar conexões
+                   (sobe um novo master com o código novo e encerra o antigo)
+    SIGTERM      - para de aceitar conexões e espera as requisições em andamento
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("API_BIND", "0.0.0.0:5000")
+
+# Workers prefork gthread: um processo por CPU, cada um com API_THREADS threads
+# (a concorrência vem das threads; (2 x CPUs) + 1 é a regra para workers sync).
+# Cada worker abre até POSTGRES_POOL_MAX conexões (padrão: API_THREADS), então
+# workers x POSTGRES_POOL_MAX precisa caber no max_connections do PostgreSQL.
+workers = int(os.getenv("API_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.getenv("API_THREADS", "4"))
+
+# Carrega a aplicação uma vez no master antes do fork (startup mais rápido e
+# erros de importação aparecem antes de subir os workers). Por isso SIGHUP não
+# recarrega código: para publicar código novo use SIGUSR2 seguido de SIGQUIT.
+preload_app = True
+
+# Tempo para terminar requisições em andamento em SIGTERM/SIGHUP
+graceful_timeout = int(os.getenv("API_GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("API_TIMEOUT", "60"))
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    """Não sobe os workers se o banco não tem as migrações exigidas pela API
+    e avisa se o total de conexões dos workers passa do max_connections"""
+    from main import verificar_schema, fechar_pool, limite_conexoes_banco, POSTGRES_POOL_MAX
+
+    if not verificar_schema():
+        server.log.warning("Banco indisponível: não foi possível conferir as migrações")
+
+    limite = limite_conexoes_banco()
+    total = server.cfg.workers * POSTGRES_POOL_MAX
+    if limite is not None and total > limite:
+        server.log.warning(
+            "%s workers x POSTGRES_POOL_MAX=%s = %s conexões, acima do limite do banco (%s). "
+            "Reduza API_WORKERS/POSTGRES_POOL_MAX ou aumente max_connections",
+            server.cfg.workers, POSTGRES_POOL_MAX, total, limite
+        )
+    # Conexões abertas no master não devem ser herdadas pelos workers
+    fechar_pool()
+
+
+def post_fork(server, worker):
+    """Abre o pool de conexões do worker antes de ele receber requisições"""
+    from main import aquecer_pool
+
+    if aquecer_pool():
+        server.log.info("Worker %s: pool de conexões aquecido", worker.pid)
+    else:
+        server.log.warning("Worker %s: banco indisponível, /ready retornará 503", worker.pid)
+
+
+def worker_exit(server, worker):
+    """Fecha as conexões do worker ao encerrar"""
+    from main import fechar_pool
+
+    fechar_pool()
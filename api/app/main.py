@@ -1,34 +1,166 @@
+import hmac
 import os
+import threading
+from datetime import datetime, timedelta
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, g
+from profiler import Profiler, ProfilerIndisponivelError
 app = Flask(__name__)
-load_dotenv("../.env")
+
+# .env resolvido a partir deste arquivo, independente do diretório de trabalho.
+# Variáveis já definidas no ambiente têm prioridade sobre o .env.
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
 
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
+# O pool só mantém abertas até POSTGRES_POOL_MIN conexões devolvidas (as demais
+# são fechadas), então mínimo e máximo padrão são uma conexão por thread do worker.
+# No total são até (workers x POSTGRES_POOL_MAX) conexões, que precisam caber no
+# max_connections do PostgreSQL (conferido ao iniciar o gunicorn).
+POSTGRES_POOL_MIN = int(os.getenv("POSTGRES_POOL_MIN", os.getenv("API_THREADS", "4")))
+POSTGRES_POOL_MAX = max(int(os.getenv("POSTGRES_POOL_MAX", POSTGRES_POOL_MIN)), POSTGRES_POOL_MIN)
+# Tempo máximo (segundos) esperando uma conexão livre quando o pool está cheio
+POSTGRES_POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "5"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Pool de conexões do processo. Conexões não podem ser herdadas num fork,
+# então o pool é recriado quando o PID muda (cada worker tem o seu).
+_pool = None
+_pool_pid = None
+_pool_vagas = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Retorna o pool de conexões do processo atual, criando-o se necessário"""
+    global _pool, _pool_pid, _pool_vagas
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadedConnectionPool(
+                POSTGRES_POOL_MIN,
+                POSTGRES_POOL_MAX,
+                host=POSTGRES_HOST,
+                database=POSTGRES_DB,
+                user=POSTGRES_USER,
+                password=POSTGRES_PASSWORD,
+                port=POSTGRES_PORT,
+                cursor_factory=RealDictCursor  # Retorna resultados como dicionário
+            )
+            _pool_pid = os.getpid()
+            # getconn() falha na hora com o pool cheio; o semáforo faz esperar
+            _pool_vagas = threading.BoundedSemaphore(POSTGRES_POOL_MAX)
+        return _pool
+
+def aquecer_pool():
+    """Cria o pool do processo e abre as conexões mínimas (chamado ao iniciar cada worker)"""
+    try:
+        get_pool()
+        return True
+    except psycopg2.Error as e:
+        print(f"Erro ao conectar com o banco de dados: {e}")
+        return False
+
+def fechar_pool():
+    """Fecha todas as conexões do pool do processo atual"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
 
 # Configuração da conexão com o banco de dados
 def get_db_connection():
-    """Retorna uma conexão com o banco PostgreSQL"""
+    """Retorna uma conexão do pool com o banco PostgreSQL (espera até POSTGRES_POOL_TIMEOUT se estiver cheio)"""
     try:
-        connection = psycopg2.connect(
-            host=POSTGRES_HOST,
-            database=POSTGRES_DB,
-            user=POSTGRES_USER,
-            password=POSTGRES_PASSWORD,
-            port=POSTGRES_PORT,
-            cursor_factory=RealDictCursor  # Retorna resultados como dicionário
-        )
-        return connection
+        pool = get_pool()
+        vagas = _pool_vagas
+        if not vagas.acquire(timeout=POSTGRES_POOL_TIMEOUT):
+            print("Erro ao conectar com o banco de dados: pool de conexões esgotado")
+            return None
+        try:
+            return pool.getconn()
+        except psycopg2.Error:
+            vagas.release()
+            raise
     except psycopg2.Error as e:
         print(f"Erro ao conectar com o banco de dados: {e}")
         return None
 
+def release_db_connection(connection):
+    """Devolve a conexão ao pool (transações abertas são desfeitas)"""
+    try:
+        get_pool().putconn(connection)
+    except psycopg2.Error:
+        connection.close()
+    try:
+        _pool_vagas.release()
+    except ValueError:
+        # Conexão de um pool anterior (recriado após fork ou fechar_pool)
+        pass
+
+def limite_conexoes_banco():
+    """Retorna quantas conexões o PostgreSQL aceita de usuários comuns, ou None se não respondeu"""
+    connection = get_db_connection()
+    if not connection:
+        return None
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT current_setting('max_connections')::int
+                 - current_setting('superuser_reserved_connections')::int AS limite
+        """)
+        return cursor.fetchone()['limite']
+    except psycopg2.Error as e:
+        print(f"Erro ao consultar max_connections: {e}")
+        return None
+    finally:
+        cursor.close()
+        release_db_connection(connection)
+
+
+# Última migração (api/migrations) de que as queries da API dependem
+VERSAO_SCHEMA_MINIMA = "0002"
+
+class SchemaDesatualizadoError(Exception):
+    """O banco não tem as migrações exigidas pela API"""
+
+def verificar_schema():
+    """Confere se o banco tem as migrações exigidas pela API.
+
+    Retorna True se está atualizado, False se o banco não respondeu e levanta
+    SchemaDesatualizadoError se faltam migrações.
+    """
+    connection = get_db_connection()
+    if not connection:
+        return False
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS existe")
+        versao = None
+        if cursor.fetchone()['existe']:
+            cursor.execute("SELECT MAX(versao) AS versao FROM schema_migrations")
+            versao = cursor.fetchone()['versao']
+    except psycopg2.Error as e:
+        print(f"Erro ao verificar migrações: {e}")
+        return False
+    finally:
+        cursor.close()
+        release_db_connection(connection)
+
+    if versao is None or versao < VERSAO_SCHEMA_MINIMA:
+        raise SchemaDesatualizadoError(
+            f"Banco na migração {versao or 'nenhuma'}, a API exige {VERSAO_SCHEMA_MINIMA}. "
+            "Execute: python migrar.py"
+        )
+    return True
+
 
 class Material:
     def __init__(self, id, nome, descricao, data_criacao=None, data_atualizacao=None):
@@ -47,15 +179,116 @@ class Material:
             "data_atualizacao": str(self.data_atualizacao) if self.data_atualizacao else None
         }
 
-def get_materials():
-    """Busca todos os materiais do banco de dados"""
+class ChamadaCompartilhadaError(Exception):
+    """Erro entregue às threads que aguardavam uma chamada compartilhada que falhou"""
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave em uma única execução.
+
+    A primeira thread que chega com uma chave executa a função; as demais
+    aguardam e recebem o mesmo resultado. Se a função falhar, cada uma delas
+    recebe um ChamadaCompartilhadaError próprio, encadeado ao erro original.
+    Nada é guardado depois que a chamada termina, então não funciona como cache.
+
+    Leitura das próprias escritas: uma thread que se junta a uma leitura
+    iniciada antes do seu commit veria dados antigos. Por isso as escritas
+    chamam invalidar(), e leituras novas não se juntam às anteriores a ela.
+    A garantia vale dentro do processo; com vários workers, outro worker pode
+    estar no meio de uma leitura iniciada antes do commit.
+    """
+
+    class _Chamada:
+        def __init__(self):
+            self.evento = threading.Event()
+            self.resultado = None
+            self.erro = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._em_andamento = {}
+        self._geracao = 0
+
+    def invalidar(self):
+        """Faz as próximas chamadas ignorarem as que já estão em andamento"""
+        with self._lock:
+            self._geracao += 1
+
+    def executar(self, chave, funcao):
+        with self._lock:
+            chave = (self._geracao, chave)
+            chamada = self._em_andamento.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._em_andamento[chave] = SingleFlight._Chamada()
+
+        if not lider:
+            chamada.evento.wait()
+            if chamada.erro is not None:
+                raise ChamadaCompartilhadaError(str(chamada.erro)) from chamada.erro
+            return chamada.resultado
+
+        try:
+            chamada.resultado = funcao()
+        except Exception as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave]
+            chamada.evento.set()
+        return chamada.resultado
+
+
+# Leituras idênticas simultâneas compartilham uma única query e um único buffer JSON
+leituras = SingleFlight()
+
+
+def resposta_json(corpo, status):
+    """Monta uma resposta a partir de um corpo JSON já serializado"""
+    return Response(corpo, status=status, mimetype="application/json")
+
+
+SQL_BUSCAR_MATERIAL_POR_ID = """
+    SELECT id, nome, descricao, data_criacao, data_atualizacao
+    FROM materiais
+    WHERE id = %s AND data_exclusao IS NULL
+"""
+
+def montar_consulta_materiais(desde=None, ate=None):
+    """Monta a query de listagem de materiais ativos, com filtro opcional por data_criacao.
+
+    O filtro por data_criacao permite usar o índice de data_criacao e, com a
+    tabela particionada, acessar apenas as partições do período.
+    """
+    condicoes = ["data_exclusao IS NULL"]
+    valores = []
+
+    if desde is not None:
+        condicoes.append("data_criacao >= %s")
+        valores.append(desde)
+
+    if ate is not None:
+        condicoes.append("data_criacao < %s")
+        valores.append(ate)
+
+    query = f"""
+        SELECT id, nome, descricao, data_criacao, data_atualizacao
+        FROM materiais
+        WHERE {' AND '.join(condicoes)}
+        ORDER BY id
+    """
+    return query, valores
+
+def get_materials(desde=None, ate=None):
+    """Busca os materiais ativos do banco de dados"""
     connection = get_db_connection()
     if not connection:
         return []
     
     try:
         cursor = connection.cursor()
-        cursor.execute("SELECT id, nome, descricao, data_criacao, data_atualizacao FROM materiais ORDER BY id")
+        cursor.execute(*montar_consulta_materiais(desde, ate))
         rows = cursor.fetchall()
         
         materiais = []
@@ -77,15 +310,42 @@ def get_materials():
     
     finally:
         cursor.close()
-        connection.close()
+        release_db_connection(connection)
+
+def serializar_materiais(desde=None, ate=None):
+    """Busca os materiais e devolve a lista já serializada em JSON"""
+    materiais = get_materials(desde, ate)
+    return app.json.dumps([material.to_dict() for material in materiais])
+
+def ler_data_parametro(nome, fim_do_dia=False):
+    """Lê um parâmetro de query string no formato ISO (ex.: 2025-08-02).
+
+    Com fim_do_dia, uma data sem horário vira o início do dia seguinte, para
+    que o limite exclusivo (data_criacao < ate) inclua o dia inteiro.
+    """
+    valor = request.args.get(nome)
+    if not valor:
+        return None
+    data = datetime.fromisoformat(valor)
+    if fim_do_dia and len(valor) == 10:
+        data += timedelta(days=1)
+    return data
 
 @app.route("/materiais", methods=["GET"])
 def retornar_materiais():
-    """Retorna todos os materiais do banco de dados"""
+    """Retorna os materiais do banco de dados, com filtro opcional por período de criação"""
+    try:
+        desde = ler_data_parametro("desde")
+        ate = ler_data_parametro("ate", fim_do_dia=True)
+    except ValueError:
+        return jsonify({"erro": "Datas devem estar no formato AAAA-MM-DD"}), 400
+
     try:
-        materiais = get_materials()
-        materiais_json = [material.to_dict() for material in materiais]
-        return jsonify(materiais_json), 200
+        corpo = leituras.executar(
+            ("materiais", desde, ate),
+            lambda: serializar_materiais(desde, ate)
+        )
+        return resposta_json(corpo, 200)
     except Exception as e:
         return jsonify({"erro": f"Erro interno do servidor: {str(e)}"}), 500
 
@@ -113,6 +373,7 @@ def cadastrar_material():
         row = cursor.fetchone()
         
         connection.commit()
+        leituras.invalidar()
         
         # Criar objeto Material com os dados retornados
         novo_material = Material(
@@ -134,7 +395,7 @@ def cadastrar_material():
     
     finally:
         cursor.close()
-        connection.close()
+        release_db_connection(connection)
 
 @app.route("/atualizar-material/<int:id>", methods=["PUT"])
 def atualizar_material(id):
@@ -151,7 +412,7 @@ def atualizar_material(id):
         cursor = connection.cursor()
         
         # Verificar se o material existe
-        cursor.execute("SELECT id FROM materiais WHERE id = %s", (id,))
+        cursor.execute("SELECT id FROM materiais WHERE id = %s AND data_exclusao IS NULL", (id,))
         if not cursor.fetchone():
             return jsonify({"erro": "Material não encontrado"}), 404
         
@@ -177,13 +438,14 @@ def atualizar_material(id):
         query = f"""
             UPDATE materiais 
             SET {', '.join(campos_update)}
-            WHERE id = %s
+            WHERE id = %s AND data_exclusao IS NULL
             RETURNING id, nome, descricao, data_criacao, data_atualizacao
         """
         
         cursor.execute(query, valores)
         row = cursor.fetchone()
         connection.commit()
+        leituras.invalidar()
         
         # Criar objeto Material atualizado
         material_atualizado = Material(
@@ -205,7 +467,7 @@ def atualizar_material(id):
     
     finally:
         cursor.close()
-        connection.close()
+        release_db_connection(connection)
 
 @app.route("/excluir-material/<int:id>", methods=["DELETE"])
 def excluir_material(id):
@@ -218,13 +480,17 @@ def excluir_material(id):
         cursor = connection.cursor()
         
         # Verificar se o material existe antes de deletar
-        cursor.execute("SELECT id FROM materiais WHERE id = %s", (id,))
+        cursor.execute("SELECT id FROM materiais WHERE id = %s AND data_exclusao IS NULL", (id,))
         if not cursor.fetchone():
             return jsonify({"erro": "Material não encontrado"}), 404
         
-        # Deletar o material
-        cursor.execute("DELETE FROM materiais WHERE id = %s", (id,))
+        # Exclusão lógica: a linha é movida para materiais_arquivo por arquivar_materiais()
+        cursor.execute(
+            "UPDATE materiais SET data_exclusao = CURRENT_TIMESTAMP WHERE id = %s AND data_exclusao IS NULL",
+            (id,)
+        )
         connection.commit()
+        leituras.invalidar()
         
         return jsonify({"mensagem": "Material excluído com sucesso"}), 200
         
@@ -234,21 +500,17 @@ def excluir_material(id):
     
     finally:
         cursor.close()
-        connection.close()
+        release_db_connection(connection)
 
-@app.route("/material/<int:id>", methods=["GET"])
-def retornar_material_por_id(id):
-    """Retorna um material específico por ID"""
+def serializar_material_por_id(id):
+    """Busca um material por ID e devolve (corpo JSON, status HTTP)"""
     connection = get_db_connection()
     if not connection:
-        return jsonify({"erro": "Erro de conexão com o banco de dados"}), 500
+        return app.json.dumps({"erro": "Erro de conexão com o banco de dados"}), 500
 
     try:
         cursor = connection.cursor()
-        cursor.execute(
-            "SELECT id, nome, descricao, data_criacao, data_atualizacao FROM materiais WHERE id = %s", 
-            (id,)
-        )
+        cursor.execute(SQL_BUSCAR_MATERIAL_POR_ID, (id,))
         row = cursor.fetchone()
         
         if row:
@@ -259,23 +521,117 @@ def retornar_material_por_id(id):
                 data_criacao=row['data_criacao'],
                 data_atualizacao=row['data_atualizacao']
             )
-            return jsonify(material.to_dict()), 200
+            return app.json.dumps(material.to_dict()), 200
         else:
-            return jsonify({"erro": "Material não encontrado"}), 404
+            return app.json.dumps({"erro": "Material não encontrado"}), 404
             
     except psycopg2.Error as e:
-        return jsonify({"erro": f"Erro ao buscar material: {str(e)}"}), 500
+        return app.json.dumps({"erro": f"Erro ao buscar material: {str(e)}"}), 500
     
     finally:
         cursor.close()
-        connection.close()
+        release_db_connection(connection)
 
-if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+@app.route("/material/<int:id>", methods=["GET"])
+def retornar_material_por_id(id):
+    """Retorna um material específico por ID"""
+    corpo, status = leituras.executar(("material", id), lambda: serializar_material_por_id(id))
+    return resposta_json(corpo, status)
 
+# Profiler sob demanda (desligado por padrão)
+profiler = Profiler(os.getenv("PROFILER_DIR"))
 
+@app.before_request
+def iniciar_coleta_profiler():
+    profiler.sincronizar()
+    if profiler.ativo:
+        rule = request.url_rule.rule if request.url_rule else None
+        g.registro_profiler = profiler.antes_da_requisicao(request.endpoint, rule)
 
+@app.teardown_request
+def encerrar_coleta_profiler(exc):
+    registro = g.pop("registro_profiler", None)
+    if registro is not None:
+        profiler.depois_da_requisicao(registro)
 
+def admin_autorizado():
+    """Confere o header X-Admin-Token contra ADMIN_TOKEN (sem ADMIN_TOKEN, nada é liberado)"""
+    token = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
 
+@app.route("/admin/profiler", methods=["GET"])
+def status_profiler():
+    """Retorna o estado do profiler no worker que atendeu (pid) e o controle compartilhado"""
+    if not admin_autorizado():
+        return jsonify({"erro": "Acesso negado"}), 403
+    try:
+        return jsonify(profiler.status()), 200
+    except ProfilerIndisponivelError as e:
+        return jsonify({"erro": f"Profiler indisponível: {e}"}), 503
+
+@app.route("/admin/profiler/iniciar", methods=["POST"])
+def iniciar_profiler():
+    """Ativa o profiler em todos os workers por N segundos e/ou N requisições, para uma rota ou todas"""
+    if not admin_autorizado():
+        return jsonify({"erro": "Acesso negado"}), 403
 
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"erro": "O corpo deve ser um objeto JSON"}), 400
 
+    try:
+        segundos = float(data["segundos"]) if data.get("segundos") else None
+        requisicoes = int(data["requisicoes"]) if data.get("requisicoes") else None
+    except (TypeError, ValueError):
+        return jsonify({"erro": "segundos e requisicoes devem ser numéricos"}), 400
+
+    if not segundos and not requisicoes:
+        return jsonify({"erro": "Informe segundos e/ou requisicoes"}), 400
+
+    try:
+        id_execucao = profiler.iniciar(
+            segundos,
+            requisicoes,
+            data.get("rota"),
+            memoria=bool(data.get("memoria")),
+            cprofile=bool(data.get("cprofile"))
+        )
+    except ProfilerIndisponivelError as e:
+        return jsonify({"erro": f"Profiler indisponível: {e}"}), 503
+    if not id_execucao:
+        return jsonify({"erro": "Profiler já está ativo"}), 409
+
+    return jsonify({"mensagem": "Profiler ativado", "status": profiler.status()}), 200
+
+@app.route("/admin/profiler/parar", methods=["POST"])
+def parar_profiler():
+    """Desativa o profiler em todos os workers; os arquivos ficam em PROFILER_DIR, um por PID"""
+    if not admin_autorizado():
+        return jsonify({"erro": "Acesso negado"}), 403
+    try:
+        return jsonify({"mensagem": "Profiler desativado", "resultado": profiler.parar()}), 200
+    except ProfilerIndisponivelError as e:
+        return jsonify({"erro": f"Profiler indisponível: {e}"}), 503
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness: o processo está de pé e atendendo requisições"""
+    return jsonify({"status": "ok"}), 200
+
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness: o worker consulta o banco e o schema tem as migrações exigidas"""
+    try:
+        if not verificar_schema():
+            return jsonify({"status": "indisponivel"}), 503
+    except SchemaDesatualizadoError as e:
+        return jsonify({"status": "indisponivel", "erro": str(e)}), 503
+    return jsonify({"status": "pronto"}), 200
+
+if __name__ == "__main__":
+    # Não sobe com o schema desatualizado: as queries falhariam em todas as rotas
+    verificar_schema()
+    # Servidor de desenvolvimento. Em produção use: gunicorn -c gunicorn.conf.py main:app
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1", host="0.0.0.0", port=5000)
@@ -0,0 +1,201 @@
+"""
+Aplica as migrações versionadas de api/migrations no banco configurado no .env
+
+Uso:
+    python migrar.py                # aplica as migrações pendentes
+    python migrar.py --particionar  # inclui migrations/opcional (particionamento)
+    python migrar.py --verificar    # confere via EXPLAIN se as queries da API usam seus índices
+    python migrar.py --criar-particao  # cria a partição do próximo ano (agendar anualmente)
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+import psycopg2
+
+from main import get_db_connection, release_db_connection, montar_consulta_materiais, SQL_BUSCAR_MATERIAL_POR_ID
+
+DIRETORIO_MIGRACOES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "migrations")
+
+
+def listar_migracoes(particionar=False):
+    """Retorna (versão, caminho) das migrações, ordenadas pela versão"""
+    diretorios = [DIRETORIO_MIGRACOES]
+    if particionar:
+        diretorios.append(os.path.join(DIRETORIO_MIGRACOES, "opcional"))
+
+    migracoes = []
+    for diretorio in diretorios:
+        for nome in os.listdir(diretorio):
+            if nome.endswith(".sql"):
+                versao = nome.split("_", 1)[0]
+                migracoes.append((versao, os.path.join(diretorio, nome)))
+    return sorted(migracoes)
+
+
+def aplicar_migracoes(particionar=False):
+    """Aplica, cada uma em sua transação, as migrações ainda não registradas"""
+    connection = get_db_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                versao VARCHAR(20) PRIMARY KEY,
+                arquivo VARCHAR(255) NOT NULL,
+                data_aplicacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        connection.commit()
+
+        cursor.execute("SELECT versao FROM schema_migrations")
+        aplicadas = {row['versao'] for row in cursor.fetchall()}
+
+        for versao, caminho in listar_migracoes(particionar):
+            if versao in aplicadas:
+                continue
+
+            with open(caminho, encoding="utf-8") as arquivo:
+                sql = arquivo.read()
+
+            try:
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (versao, arquivo) VALUES (%s, %s)",
+                    (versao, os.path.basename(caminho))
+                )
+                connection.commit()
+                print(f"Migração {versao} aplicada: {os.path.basename(caminho)}")
+            except psycopg2.Error as e:
+                connection.rollback()
+                print(f"Erro ao aplicar migração {versao}: {e}")
+                return False
+
+        return True
+
+    finally:
+        cursor.close()
+        release_db_connection(connection)
+
+
+def nos_do_plano(plano):
+    """Percorre recursivamente os nós de um plano EXPLAIN (FORMAT JSON)"""
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from nos_do_plano(filho)
+
+
+def indice_principal(cursor, nome_indice):
+    """Retorna o nome do índice da tabela principal (partições herdam índices com outros nomes)"""
+    cursor.execute("""
+        SELECT COALESCE(pai.relname, indice.relname) AS nome
+        FROM pg_class indice
+        LEFT JOIN pg_inherits heranca ON heranca.inhrelid = indice.oid
+        LEFT JOIN pg_class pai ON pai.oid = heranca.inhparent
+        WHERE indice.relname = %s
+    """, (nome_indice,))
+    row = cursor.fetchone()
+    return row['nome'] if row else nome_indice
+
+
+def verificar_planos():
+    """Confere via EXPLAIN que cada query da API usa o índice criado para ela.
+
+    Em uma transação desfeita no final, insere 20.000 materiais de teste
+    (ids negativos, metade excluídos, criados ao longo de ~4,5 anos) e roda
+    ANALYZE, para que o planejador escolha como faria com dados reais.
+    O enable_seqscan é desligado porque a listagem completa retorna muitas
+    linhas; a verificação falha se a query usar um índice fora dos aceitos.
+    A busca por id pode usar a PK ou o índice parcial de ativos (mesmo
+    predicado, índice menor); ambos mantêm a busca em O(log n).
+    """
+    agora = datetime.now()
+    consultas = [
+        ("listar materiais", montar_consulta_materiais(), {"idx_materiais_ativos_id"}),
+        (
+            "listar materiais por período",
+            montar_consulta_materiais(agora - timedelta(days=60), agora - timedelta(days=30)),
+            {"idx_materiais_data_criacao"}
+        ),
+        (
+            "buscar material por id",
+            (SQL_BUSCAR_MATERIAL_POR_ID, [-1]),
+            {"materiais_pkey", "idx_materiais_ativos_id"}
+        ),
+    ]
+
+    connection = get_db_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO materiais (id, nome, descricao, data_criacao, data_exclusao)
+            SELECT -n,
+                   'verificacao ' || n,
+                   NULL,
+                   CURRENT_TIMESTAMP - n * INTERVAL '2 hours',
+                   CASE WHEN n % 2 = 0 THEN CURRENT_TIMESTAMP END
+            FROM generate_series(1, 20000) AS n
+        """)
+        cursor.execute("ANALYZE materiais")
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+        ok = True
+        for descricao, (query, valores), aceitos in consultas:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, valores)
+            plano = cursor.fetchone()['QUERY PLAN'][0]['Plan']
+
+            indices = {
+                indice_principal(cursor, no["Index Name"])
+                for no in nos_do_plano(plano) if "Index Name" in no
+            }
+            usados = ", ".join(sorted(indices)) or "nenhum índice"
+            if indices and indices <= aceitos:
+                print(f"OK      {descricao}: {usados}")
+            else:
+                ok = False
+                print(f"FALHOU  {descricao}: esperado {' ou '.join(sorted(aceitos))}, usou {usados}")
+
+        return ok
+
+    finally:
+        connection.rollback()
+        cursor.close()
+        release_db_connection(connection)
+
+
+def criar_particao_proximo_ano():
+    """Cria a partição de materiais do próximo ano (exige a migração opcional 0003)"""
+    connection = get_db_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = connection.cursor()
+        ano = datetime.now().year + 1
+        cursor.execute("SELECT criar_particao_materiais(%s)", (ano,))
+        connection.commit()
+        print(f"Partição materiais_{ano} disponível")
+        return True
+    except psycopg2.Error as e:
+        connection.rollback()
+        print(f"Erro ao criar partição: {e}")
+        return False
+
+    finally:
+        cursor.close()
+        release_db_connection(connection)
+
+
+if __name__ == "__main__":
+    if "--verificar" in sys.argv:
+        sucesso = verificar_planos()
+    elif "--criar-particao" in sys.argv:
+        sucesso = criar_particao_proximo_ano()
+    else:
+        sucesso = aplicar_migracoes(particionar="--particionar" in sys.argv)
+    sys.exit(0 if sucesso else 1)
@@ -0,0 +1,359 @@
+"""
+Profiler sob demanda para os workers da API
+
+Quando ativado (via /admin/profiler/iniciar), amostra periodicamente as pilhas
+das threads que estão atendendo as rotas selecionadas e, ao terminar, grava
+por worker (PID):
+    - perfil-<id>-<pid>.collapsed  pilhas no formato "collapsed" (flamegraph.pl, speedscope)
+    - perfil-<id>-<pid>.prof       dump do cProfile (opcional, determinístico e caro)
+    - perfil-<id>-<pid>.tracemalloc / -memoria.txt  snapshot de alocações (opcional)
+
+A ativação é publicada em um arquivo de controle no diretório do profiler,
+que cada worker relê no máximo uma vez por segundo; assim a coleta vale para
+todos os workers, não só para o que recebeu a requisição de administração.
+O limite de requisições é contado entre todos os workers.
+
+O diretório precisa pertencer ao usuário da API e não ter permissão de
+escrita para outros usuários; caso contrário o profiler fica indisponível
+(quem pudesse gravar ali ativaria a coleta sem ADMIN_TOKEN).
+
+Desligado, o custo por requisição é uma comparação de tempo e a leitura de
+um atributo booleano.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import stat
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime
+
+
+class ProfilerIndisponivelError(Exception):
+    """O diretório do profiler não é seguro ou não pôde ser criado"""
+
+
+class _Execucao:
+    """Estado de uma coleta neste worker; gravado pela thread amostradora ao terminar"""
+
+    def __init__(self, controle):
+        self.id = controle["id"]
+        self.rota = controle.get("rota")
+        self.fim = controle.get("fim")
+        self.limite_requisicoes = controle.get("requisicoes")
+        self.memoria = bool(controle.get("memoria"))
+        self.cprofile = bool(controle.get("cprofile"))
+        self.requisicoes = 0
+        self.pilhas = Counter()
+        self.perfis = []
+        self.threads_alvo = {}
+        self.parar = threading.Event()
+        self.iniciou_tracemalloc = False
+
+    def expirou(self):
+        return bool(self.fim) and time.time() >= self.fim
+
+
+class Profiler:
+    """Profiler estatístico ativado por N segundos ou N requisições"""
+
+    def __init__(self, diretorio=None, intervalo=0.005, intervalo_controle=1.0):
+        self.diretorio = diretorio or os.path.join(tempfile.gettempdir(), "api-profiler")
+        self.intervalo = intervalo
+        self.intervalo_controle = intervalo_controle
+        self.ativo = False
+
+        self._lock = threading.Lock()
+        self._execucao = None
+        self._amostrador = None
+        self._ultimo_id = None
+        self._ultimo_resultado = None
+        self._proxima_verificacao = 0.0
+        self.erro_diretorio = self._preparar_diretorio()
+
+    def _preparar_diretorio(self):
+        """Cria o diretório com permissão 0700; retorna a mensagem de erro se não for seguro"""
+        try:
+            os.makedirs(self.diretorio, mode=0o700, exist_ok=True)
+            info = os.lstat(self.diretorio)
+        except OSError as e:
+            return f"Não foi possível criar {self.diretorio}: {e}"
+
+        if not stat.S_ISDIR(info.st_mode):
+            return f"{self.diretorio} não é um diretório"
+        if hasattr(os, "getuid") and info.st_uid != os.getuid():
+            return f"{self.diretorio} pertence a outro usuário"
+        if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return f"{self.diretorio} tem permissão de escrita para outros usuários"
+        return None
+
+    def _exigir_diretorio(self):
+        if self.erro_diretorio:
+            raise ProfilerIndisponivelError(self.erro_diretorio)
+
+    # Arquivo de controle compartilhado entre os workers
+
+    @property
+    def _arquivo_controle(self):
+        return os.path.join(self.diretorio, "controle.json")
+
+    def _ler_controle(self):
+        try:
+            with open(self._arquivo_controle, encoding="utf-8") as arquivo:
+                return json.load(arquivo)
+        except (OSError, ValueError):
+            return None
+
+    def _escrever_controle(self, controle):
+        temporario = f"{self._arquivo_controle}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(controle, arquivo)
+        os.replace(temporario, self._arquivo_controle)
+
+    @staticmethod
+    def _vigente(controle):
+        return bool(controle and controle.get("ativo")) and not (
+            controle.get("fim") and time.time() >= controle["fim"]
+        )
+
+    def _publicar_parada(self, id_execucao):
+        controle = self._ler_controle()
+        if controle and controle.get("id") == id_execucao and controle.get("ativo"):
+            controle["ativo"] = False
+            self._escrever_controle(controle)
+
+    def _contar_requisicao(self, execucao):
+        """Soma uma requisição ao contador compartilhado e retorna o total entre os workers"""
+        caminho = os.path.join(self.diretorio, f"perfil-{execucao.id}.contador")
+        fd = os.open(caminho, os.O_WRONLY | os.O_CREAT | os.O_APPEND)
+        try:
+            os.write(fd, b".")
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+    # API usada pelas rotas de administração
+
+    def iniciar(self, segundos=None, requisicoes=None, rota=None, memoria=False, cprofile=False):
+        """Publica uma nova coleta para todos os workers; retorna o id ou None se já há uma ativa"""
+        self._exigir_diretorio()
+        if self._vigente(self._ler_controle()):
+            return None
+
+        controle = {
+            "id": f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:12]}",
+            "ativo": True,
+            "fim": time.time() + segundos if segundos else None,
+            "requisicoes": requisicoes,
+            "rota": rota,
+            "memoria": memoria,
+            "cprofile": cprofile,
+        }
+        self._escrever_controle(controle)
+        self.sincronizar(forcar=True)
+        return controle["id"]
+
+    def parar(self):
+        """Publica a parada para todos os workers e aguarda a gravação deste worker"""
+        self._exigir_diretorio()
+        controle = self._ler_controle()
+        if controle and controle.get("ativo"):
+            self._publicar_parada(controle["id"])
+        self.sincronizar(forcar=True)
+
+        amostrador = self._amostrador
+        if amostrador is not None and amostrador is not threading.current_thread():
+            amostrador.join()
+        return self.status()
+
+    def status(self):
+        """Retorna o estado do profiler neste worker e o controle compartilhado"""
+        self._exigir_diretorio()
+        self.sincronizar(forcar=True)
+        with self._lock:
+            execucao = self._execucao
+            return {
+                "pid": os.getpid(),
+                "ativo": self.ativo,
+                "id": execucao.id if execucao else None,
+                "rota": execucao.rota if execucao else None,
+                "requisicoes_worker": execucao.requisicoes if execucao else None,
+                "controle": self._ler_controle(),
+                "diretorio": self.diretorio,
+                "ultimo_resultado": self._ultimo_resultado,
+            }
+
+    # Ganchos por requisição
+
+    def sincronizar(self, forcar=False):
+        """Aplica o arquivo de controle neste worker (no máximo uma leitura por intervalo_controle)"""
+        agora = time.monotonic()
+        if not forcar and agora < self._proxima_verificacao:
+            return
+        self._proxima_verificacao = agora + self.intervalo_controle
+        if self.erro_diretorio:
+            return
+
+        controle = self._ler_controle()
+        vigente = self._vigente(controle)
+
+        with self._lock:
+            execucao = self._execucao
+            if execucao is not None and (not vigente or controle["id"] != execucao.id):
+                self._encerrar(execucao)
+                execucao = None
+
+            if vigente and execucao is None and controle["id"] != self._ultimo_id:
+                if self._amostrador is not None and self._amostrador.is_alive():
+                    # Gravação da coleta anterior em andamento; tenta na próxima verificação
+                    self._proxima_verificacao = agora
+                    return
+                self._comecar(controle)
+
+    def antes_da_requisicao(self, endpoint, regra):
+        """Registra a thread atual como alvo; retorna o registro a passar para depois_da_requisicao"""
+        execucao = self._execucao
+        if execucao is None or (execucao.rota and execucao.rota not in (endpoint, regra)):
+            return None
+
+        perfil = None
+        if execucao.cprofile:
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Python 3.12+: só um cProfile ativo por vez no processo;
+                # a requisição continua coberta pela amostragem de pilhas
+                perfil = None
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            execucao.threads_alvo[thread_id] = endpoint or regra or "desconhecida"
+        return execucao, thread_id, perfil
+
+    def depois_da_requisicao(self, registro):
+        """Encerra a coleta da requisição e aplica o limite de requisições"""
+        execucao, thread_id, perfil = registro
+        if perfil is not None:
+            perfil.disable()
+
+        with self._lock:
+            execucao.threads_alvo.pop(thread_id, None)
+            if execucao.parar.is_set():
+                return
+            if perfil is not None:
+                execucao.perfis.append(perfil)
+            execucao.requisicoes += 1
+
+        if execucao.limite_requisicoes and self._contar_requisicao(execucao) >= execucao.limite_requisicoes:
+            self._publicar_parada(execucao.id)
+            with self._lock:
+                if self._execucao is execucao:
+                    self._encerrar(execucao)
+
+    # Internos (chamados com self._lock adquirido)
+
+    def _comecar(self, controle):
+        execucao = _Execucao(controle)
+        if execucao.memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            execucao.iniciou_tracemalloc = True
+
+        self._execucao = execucao
+        self._ultimo_id = execucao.id
+        self._amostrador = threading.Thread(
+            target=self._amostrar, args=(execucao,), name="profiler-amostrador", daemon=True
+        )
+        self.ativo = True
+        self._amostrador.start()
+
+    def _encerrar(self, execucao):
+        execucao.parar.set()
+        self._execucao = None
+        self.ativo = False
+
+    # Thread amostradora
+
+    def _amostrar(self, execucao):
+        """Coleta as pilhas das threads alvo e, ao terminar, grava os resultados"""
+        while not execucao.parar.wait(self.intervalo):
+            if execucao.expirou():
+                with self._lock:
+                    if self._execucao is execucao:
+                        self._encerrar(execucao)
+                break
+            self.sincronizar()
+
+            with self._lock:
+                alvos = dict(execucao.threads_alvo)
+            if not alvos:
+                continue
+
+            frames = sys._current_frames()
+            amostras = []
+            for thread_id, rota in alvos.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    amostras.append(self._pilha_colapsada(rota, frame))
+
+            with self._lock:
+                execucao.pilhas.update(amostras)
+
+        resultado = self._gravar(execucao)
+        with self._lock:
+            self._ultimo_resultado = resultado
+
+    @staticmethod
+    def _pilha_colapsada(rota, frame):
+        """Converte um frame em uma linha "rota;raiz;...;folha" """
+        nomes = []
+        while frame is not None:
+            codigo = frame.f_code
+            nomes.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+            frame = frame.f_back
+        nomes.append(rota)
+        return ";".join(reversed(nomes))
+
+    def _gravar(self, execucao):
+        """Grava os resultados da coleta deste worker no diretório do profiler"""
+        with self._lock:
+            pilhas = Counter(execucao.pilhas)
+            perfis = list(execucao.perfis)
+            requisicoes = execucao.requisicoes
+
+        prefixo = os.path.join(self.diretorio, f"perfil-{execucao.id}-{os.getpid()}")
+        arquivos = {}
+
+        with open(prefixo + ".collapsed", "w", encoding="utf-8") as arquivo:
+            for pilha, quantidade in pilhas.most_common():
+                arquivo.write(f"{pilha} {quantidade}\n")
+        arquivos["collapsed"] = prefixo + ".collapsed"
+
+        if perfis:
+            pstats.Stats(*perfis).dump_stats(prefixo + ".prof")
+            arquivos["cprofile"] = prefixo + ".prof"
+
+        if execucao.iniciou_tracemalloc:
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            snapshot.dump(prefixo + ".tracemalloc")
+            with open(prefixo + "-memoria.txt", "w", encoding="utf-8") as arquivo:
+                for estatistica in snapshot.statistics("lineno")[:50]:
+                    arquivo.write(f"{estatistica}\n")
+            arquivos["tracemalloc"] = prefixo + ".tracemalloc"
+            arquivos["memoria"] = prefixo + "-memoria.txt"
+
+        return {
+            "id": execucao.id,
+            "pid": os.getpid(),
+            "amostras": sum(pilhas.values()),
+            "requisicoes": requisicoes,
+            "arquivos": arquivos,
+        }
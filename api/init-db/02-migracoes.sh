@@ -0,0 +1,24 @@
+#!/bin/bash
+# Aplica as migrações versionadas (api/migrations) na criação do banco pelo Docker
+# e registra cada uma em schema_migrations, como o app/migrar.py faz.
+# Bancos já existentes não passam por aqui: use "python migrar.py".
+
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        versao VARCHAR(20) PRIMARY KEY,
+        arquivo VARCHAR(255) NOT NULL,
+        data_aplicacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+SQL
+
+for caminho in /docker-entrypoint-migrations/*.sql; do
+    arquivo=$(basename "$caminho")
+    versao=${arquivo%%_*}
+    echo "Aplicando migração $versao: $arquivo"
+    {
+        cat "$caminho"
+        echo "INSERT INTO schema_migrations (versao, arquivo) VALUES ('$versao', '$arquivo');"
+    } | psql -v ON_ERROR_STOP=1 --single-transaction --username "$POSTGRES_USER" --dbname "$POSTGRES_DB"
+done
@@ -0,0 +1,6 @@
+-- Migração 0001: índices B-tree para ordenações e consultas por período
+-- Sem estes índices, ordenar por nome ou filtrar por data faz varredura sequencial
+
+CREATE INDEX IF NOT EXISTS idx_materiais_nome ON materiais (nome);
+CREATE INDEX IF NOT EXISTS idx_materiais_data_criacao ON materiais (data_criacao);
+CREATE INDEX IF NOT EXISTS idx_materiais_data_atualizacao ON materiais (data_atualizacao);
@@ -0,0 +1,47 @@
+-- Migração 0002: exclusão lógica e arquivamento de materiais
+-- A API passa a marcar data_exclusao em vez de apagar a linha.
+-- Linhas excluídas há mais de N dias são movidas para materiais_arquivo.
+
+ALTER TABLE materiais ADD COLUMN IF NOT EXISTS data_exclusao TIMESTAMP;
+
+-- Índice parcial usado pela listagem (apenas materiais ativos, ordenados por id)
+CREATE INDEX IF NOT EXISTS idx_materiais_ativos_id ON materiais (id) WHERE data_exclusao IS NULL;
+
+-- Índice parcial usado pelo arquivamento (apenas materiais excluídos)
+CREATE INDEX IF NOT EXISTS idx_materiais_data_exclusao ON materiais (data_exclusao) WHERE data_exclusao IS NOT NULL;
+
+-- Tabela de arquivo (linhas frias, fora da tabela principal)
+CREATE TABLE IF NOT EXISTS materiais_arquivo (
+    id INTEGER PRIMARY KEY,
+    nome VARCHAR(255) NOT NULL,
+    descricao TEXT,
+    data_criacao TIMESTAMP,
+    data_atualizacao TIMESTAMP,
+    data_exclusao TIMESTAMP,
+    data_arquivamento TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_materiais_arquivo_data_criacao ON materiais_arquivo (data_criacao);
+
+-- Move para o arquivo os materiais excluídos há mais de "dias" dias
+-- Uso: SELECT arquivar_materiais(30);
+CREATE OR REPLACE FUNCTION arquivar_materiais(dias INTEGER DEFAULT 30)
+RETURNS INTEGER AS $$
+DECLARE
+    total INTEGER;
+BEGIN
+    WITH movidos AS (
+        DELETE FROM materiais
+        WHERE data_exclusao IS NOT NULL
+          AND data_exclusao < CURRENT_TIMESTAMP - make_interval(days => dias)
+        RETURNING id, nome, descricao, data_criacao, data_atualizacao, data_exclusao
+    )
+    INSERT INTO materiais_arquivo (id, nome, descricao, data_criacao, data_atualizacao, data_exclusao)
+    SELECT id, nome, descricao, data_criacao, data_atualizacao, data_exclusao FROM movidos;
+    -- Sem ON CONFLICT: um id já arquivado aborta a operação inteira em vez de
+    -- apagar a linha de materiais sem guardá-la no arquivo
+
+    GET DIAGNOSTICS total = ROW_COUNT;
+    RETURN total;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,107 @@
+-- Migração opcional 0003: particionamento de materiais por data_criacao
+-- Aplicada apenas com: python migrar.py --particionar
+--
+-- A tabela é recriada como particionada por ano (RANGE em data_criacao).
+-- Como a chave de partição precisa fazer parte da chave primária, a PK passa
+-- a ser (id, data_criacao) e o banco deixa de garantir que o id é único.
+-- Ids gerados pela sequence não se repetem, mas um INSERT com id explícito
+-- pode duplicar um id (e o duplicado faria arquivar_materiais falhar, pois
+-- materiais_arquivo.id é PK). Nunca informe o id ao inserir em materiais.
+-- Consultas com filtro em data_criacao (ex.: /materiais?desde=...&ate=...)
+-- acessam apenas as partições do período.
+
+ALTER TABLE materiais RENAME TO materiais_legado;
+ALTER TABLE materiais_legado RENAME CONSTRAINT materiais_pkey TO materiais_legado_pkey;
+ALTER SEQUENCE materiais_id_seq OWNED BY NONE;
+
+CREATE TABLE materiais (
+    id INTEGER NOT NULL DEFAULT nextval('materiais_id_seq'),
+    nome VARCHAR(255) NOT NULL,
+    descricao TEXT,
+    data_criacao TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_exclusao TIMESTAMP,
+    PRIMARY KEY (id, data_criacao)
+) PARTITION BY RANGE (data_criacao);
+
+ALTER SEQUENCE materiais_id_seq OWNED BY materiais.id;
+
+-- Cria a partição anual de materiais (idempotente)
+-- Uso: SELECT criar_particao_materiais(2027);
+-- Linhas do ano que já estejam em materiais_padrao são movidas para a nova
+-- partição antes do ATTACH (senão o ATTACH falharia). Agende a criação do
+-- próximo ano (python migrar.py --criar-particao) para que a partição padrão
+-- continue apenas como rede de segurança.
+CREATE OR REPLACE FUNCTION criar_particao_materiais(ano INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    particao TEXT := 'materiais_' || ano;
+    inicio DATE := make_date(ano, 1, 1);
+    fim DATE := make_date(ano + 1, 1, 1);
+BEGIN
+    IF to_regclass(particao) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE materiais INCLUDING DEFAULTS)', particao);
+
+    IF to_regclass('materiais_padrao') IS NOT NULL THEN
+        EXECUTE format(
+            'WITH movidos AS (
+                 DELETE FROM materiais_padrao
+                 WHERE data_criacao >= %L AND data_criacao < %L
+                 RETURNING id, nome, descricao, data_criacao, data_atualizacao, data_exclusao
+             )
+             INSERT INTO %I (id, nome, descricao, data_criacao, data_atualizacao, data_exclusao)
+             SELECT id, nome, descricao, data_criacao, data_atualizacao, data_exclusao FROM movidos',
+            inicio, fim, particao
+        );
+    END IF;
+
+    -- O ATTACH cria na partição os índices, a PK e o trigger da tabela principal
+    EXECUTE format(
+        'ALTER TABLE materiais ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        particao, inicio, fim
+    );
+END;
+$$ language 'plpgsql';
+
+-- Partições do ano mais antigo existente até o próximo ano
+DO $$
+DECLARE
+    ano INTEGER;
+    primeiro_ano INTEGER;
+    ultimo_ano INTEGER := EXTRACT(YEAR FROM CURRENT_DATE)::INTEGER + 1;
+BEGIN
+    SELECT COALESCE(MIN(EXTRACT(YEAR FROM data_criacao))::INTEGER, ultimo_ano - 1)
+    INTO primeiro_ano
+    FROM materiais_legado;
+
+    FOR ano IN primeiro_ano..ultimo_ano LOOP
+        PERFORM criar_particao_materiais(ano);
+    END LOOP;
+END;
+$$;
+
+-- Partição padrão para datas fora das partições anuais
+CREATE TABLE IF NOT EXISTS materiais_padrao PARTITION OF materiais DEFAULT;
+
+INSERT INTO materiais (id, nome, descricao, data_criacao, data_atualizacao, data_exclusao)
+SELECT id, nome, descricao, COALESCE(data_criacao, CURRENT_TIMESTAMP), data_atualizacao, data_exclusao
+FROM materiais_legado;
+
+DROP TABLE materiais_legado;
+
+-- Índices (criados em cada partição automaticamente)
+CREATE INDEX IF NOT EXISTS idx_materiais_nome ON materiais (nome);
+CREATE INDEX IF NOT EXISTS idx_materiais_data_criacao ON materiais (data_criacao);
+CREATE INDEX IF NOT EXISTS idx_materiais_data_atualizacao ON materiais (data_atualizacao);
+CREATE INDEX IF NOT EXISTS idx_materiais_ativos_id ON materiais (id) WHERE data_exclusao IS NULL;
+CREATE INDEX IF NOT EXISTS idx_materiais_data_exclusao ON materiais (data_exclusao) WHERE data_exclusao IS NOT NULL;
+
+-- Recriar trigger de data_atualizacao na nova tabela
+DROP TRIGGER IF EXISTS update_materiais_data_atualizacao ON materiais;
+CREATE TRIGGER update_materiais_data_atualizacao 
+    BEFORE UPDATE ON materiais 
+    FOR EACH ROW 
+    EXECUTE FUNCTION update_data_atualizacao_column();
@@ -6,12 +6,55 @@ Sistema de Gerenciamento de Materiais
 Aplicação desktop com tkinter para CRUD de materiais via API
 """
 
+import time
+_INICIO = time.perf_counter()
+
+import os
+import sys
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-import requests
 import json
 from typing import List, Dict, Optional
 
+
+class TemposInicializacao:
+    """Registra quanto tempo cada etapa da inicialização levou"""
+    
+    def __init__(self, inicio: float, ativo: bool = False):
+        self.inicio = inicio
+        self.anterior = inicio
+        self.ativo = ativo
+        self.etapas = []
+    
+    def marcar(self, etapa: str):
+        """Registra o fim de uma etapa"""
+        agora = time.perf_counter()
+        self.etapas.append((etapa, agora - self.anterior, agora - self.inicio))
+        self.anterior = agora
+    
+    def relatorio(self):
+        """Imprime o relatório de tempos (com --tempos ou SISTEMA_TEMPOS=1)"""
+        if not self.ativo:
+            return
+        print("Tempos de inicialização:")
+        for etapa, duracao, acumulado in self.etapas:
+            print(f"  {etapa:<35} {duracao * 1000:8.1f} ms  (total {acumulado * 1000:8.1f} ms)")
+
+
+tempos = TemposInicializacao(
+    _INICIO,
+    ativo="--tempos" in sys.argv or os.getenv("SISTEMA_TEMPOS") == "1"
+)
+tempos.marcar("importações")
+
+
+def _requests():
+    """Importa requests apenas no primeiro uso, fora do caminho de abertura da janela"""
+    import requests
+    return requests
+
 class APIClient:
     """Cliente para comunicação com a API de materiais"""
     
@@ -20,6 +63,7 @@ class APIClient:
     
     def get_materiais(self) -> List[Dict]:
         """Obtém lista de materiais da API"""
+        requests = _requests()
         try:
             response = requests.get(f"{self.base_url}/materiais")
             if response.status_code == 200:
@@ -33,6 +77,7 @@ class APIClient:
     
     def criar_material(self, nome: str, descricao: str) -> bool:
         """Cria um novo material via API"""
+        requests = _requests()
         try:
             data = {"nome": nome, "descricao": descricao}
             response = requests.post(f"{self.base_url}/cadastrar-material", json=data)
@@ -43,6 +88,7 @@ class APIClient:
     
     def atualizar_material(self, material_id: int, nome: str, descricao: str) -> bool:
         """Atualiza um material existente via API"""
+        requests = _requests()
         try:
             data = {"nome": nome, "descricao": descricao}
             response = requests.put(f"{self.base_url}/atualizar-material/{material_id}", json=data)
@@ -53,6 +99,7 @@ class APIClient:
     
     def deletar_material(self, material_id: int) -> bool:
         """Deleta um material via API"""
+        requests = _requests()
         try:
             response = requests.delete(f"{self.base_url}/excluir-material/{material_id}")
             return response.status_code == 200
@@ -80,9 +127,12 @@ class ListaMateriais:
         self.on_incluir = on_incluir
         self.on_editar = on_editar
         self.materiais = []
+        self.carregando = False
+        self.recarga_pendente = False
+        self.on_carregado = None
+        self._resultado = queue.Queue()
         
         self.setup_ui()
-        self.carregar_materiais()
     
     def setup_ui(self):
         """Configura a interface da tela de listagem"""
@@ -135,13 +185,55 @@ class ListaMateriais:
                   command=self.excluir_material).pack(side=tk.LEFT, padx=5)
     
     def carregar_materiais(self):
-        """Carrega materiais da API e atualiza a treeview"""
+        """Recarrega os materiais da API em uma thread, sem bloquear a interface"""
+        if self.carregando:
+            # A busca em andamento pode ser anterior a uma alteração: repetir ao terminar
+            self.recarga_pendente = True
+            return
+        self.carregando = True
+        self.recarga_pendente = False
+        
+        threading.Thread(target=self._buscar_materiais, daemon=True).start()
+        self.frame.after(50, self._verificar_carregamento)
+    
+    def _buscar_materiais(self):
+        """Executada na thread: sempre entrega um resultado (lista ou exceção)"""
+        resultado = None
+        try:
+            resultado = self.api_client.get_materiais()
+        except Exception as e:
+            resultado = e
+        finally:
+            self._resultado.put(resultado)
+    
+    def _verificar_carregamento(self):
+        """Aplica o resultado da thread na treeview (tkinter só na thread principal)"""
+        try:
+            materiais = self._resultado.get_nowait()
+        except queue.Empty:
+            self.frame.after(50, self._verificar_carregamento)
+            return
+        
+        self.carregando = False
+        if self.recarga_pendente:
+            self.carregar_materiais()
+            return
+        
+        if not isinstance(materiais, list):
+            print(f"Erro ao carregar materiais: {materiais}")
+        else:
+            self.preencher_treeview(materiais)
+        
+        if self.on_carregado:
+            self.on_carregado()
+    
+    def preencher_treeview(self, materiais: List[Dict]):
+        """Substitui o conteúdo da treeview pelos materiais informados"""
         # Limpar treeview
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        # Carregar dados da API
-        self.materiais = self.api_client.get_materiais()
+        self.materiais = materiais
         
         # Inserir na treeview
         for material in self.materiais:
@@ -393,6 +485,7 @@ class SistemaMateriais:
         self.root.title("Sistema de Gerenciamento de Materiais")
         self.root.geometry("800x600")
         self.root.minsize(600, 400)
+        tempos.marcar("criação da janela")
         
         # Cliente da API
         self.api_client = APIClient()
@@ -401,45 +494,69 @@ class SistemaMateriais:
         self.container = ttk.Frame(self.root)
         self.container.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Inicializar telas
+        # Tela inicial; inclusão e edição são criadas no primeiro uso
         self.tela_lista = ListaMateriais(
             self.container, 
             self.api_client,
             on_incluir=self.mostrar_incluir,
             on_editar=self.mostrar_editar
         )
+        self._tela_incluir = None
+        self._tela_editar = None
+        tempos.marcar("montagem da tela de listagem")
         
-        self.tela_incluir = IncluirMaterial(
-            self.container,
-            self.api_client,
-            on_voltar=self.mostrar_lista
-        )
-        
-        self.tela_editar = EditarMaterial(
-            self.container,
-            self.api_client,
-            on_voltar=self.mostrar_lista
-        )
+        # Relatório de tempos quando a carga inicial terminar
+        self.tela_lista.on_carregado = self._carga_inicial_concluida
+        self.root.after_idle(lambda: tempos.marcar("janela desenhada"))
         
-        # Mostrar tela inicial
+        # Mostrar tela inicial (a lista é carregada em segundo plano)
         self.mostrar_lista()
     
+    def _carga_inicial_concluida(self):
+        """Fecha o relatório de tempos após a primeira carga da lista"""
+        self.tela_lista.on_carregado = None
+        tempos.marcar("carga inicial da lista")
+        tempos.relatorio()
+    
+    @property
+    def tela_incluir(self) -> IncluirMaterial:
+        if self._tela_incluir is None:
+            self._tela_incluir = IncluirMaterial(
+                self.container,
+                self.api_client,
+                on_voltar=self.mostrar_lista
+            )
+        return self._tela_incluir
+    
+    @property
+    def tela_editar(self) -> EditarMaterial:
+        if self._tela_editar is None:
+            self._tela_editar = EditarMaterial(
+                self.container,
+                self.api_client,
+                on_voltar=self.mostrar_lista
+            )
+        return self._tela_editar
+    
+    def _ocultar_telas(self):
+        """Oculta as telas já criadas"""
+        for tela in (self.tela_lista, self._tela_incluir, self._tela_editar):
+            if tela is not None:
+                tela.hide()
+    
     def mostrar_lista(self):
         """Mostra a tela de listagem"""
-        self.tela_incluir.hide()
-        self.tela_editar.hide()
+        self._ocultar_telas()
         self.tela_lista.show()
     
     def mostrar_incluir(self):
         """Mostra a tela de inclusão"""
-        self.tela_lista.hide()
-        self.tela_editar.hide()
+        self._ocultar_telas()
         self.tela_incluir.show()
     
     def mostrar_editar(self, material):
         """Mostra a tela de edição"""
-        self.tela_lista.hide()
-        self.tela_incluir.hide()
+        self._ocultar_telas()
         self.tela_editar.carregar_material(material)
         self.tela_editar.show()
     